@@ -7,164 +7,534 @@ Optimizado para ejecutarse en Ubuntu con SingleFile CLI
 
 import os
 import json
+import shutil
 import subprocess
 import argparse
+import asyncio
+import functools
+import hashlib
 import logging
+import logging.handlers
+import queue
+import re
+import signal
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 import time
-import concurrent.futures
+import urllib.error
+import urllib.request
 from urllib.parse import urlparse
 
+# orjson serializa varias veces más rápido que json; opcional con fallback a stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ijson permite leer configuraciones enormes en streaming; opcional
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# zstandard comprime las capturas antes de versionarlas; opcional
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Umbral a partir del cual conviene parsear config/urls.json en streaming
+_STREAMING_CONFIG_SIZE = 1024 * 1024  # 1 MiB
+
+# Límites de cortesía por dominio: evita martillar un mismo host
+# mientras otros dominios quedan ociosos
+_DOMAIN_MAX_CONCURRENT = 2
+_DOMAIN_MIN_DELAY = 1.0  # segundos entre solicitudes al mismo dominio
+
+# User-Agent de navegador para los HEAD de sondeo: sitios comerciales
+# con anti-bot responden 403/429 al User-Agent por defecto de urllib
+# aunque la captura real con Chromium funcione
+_PROBE_USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                     '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+# Regex compiladas una sola vez para sanitizar nombres de archivo en C
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9 _-]+')
+_SPACES = re.compile(r'\s+')
+_NON_FILENAME = re.compile(r'[^A-Za-z0-9_-]+')
+_SAFE_NAME = re.compile(r'[A-Za-z0-9_-]{1,80}')
+
+@functools.lru_cache(maxsize=1)
+def _worker_zstd():
+    """Compresor zstd único por proceso worker"""
+    return zstandard.ZstdCompressor(level=19)
+
+def _post_process_capture(path_str):
+    """Comprimir y hashear una captura; corre en un proceso worker
+
+    Es función de módulo para que ProcessPoolExecutor pueda serializarla.
+    Devuelve (ruta final, tamaño en disco, sha256 del archivo final).
+    """
+    path = Path(path_str)
+    data = path.read_bytes()
+
+    if zstandard is not None:
+        compressed = _worker_zstd().compress(data)
+        final_path = path.with_suffix('.html.zst')
+        # Escribir a un temporal y reemplazar: si final_path ya existe como
+        # enlace duro a la captura de una semana anterior (cache de ETag),
+        # escribir encima mutaría ese archivo archivado a través del inodo
+        # compartido; os.replace crea un inodo nuevo y preserva el viejo
+        tmp_path = final_path.with_name(final_path.name + '.tmp')
+        tmp_path.write_bytes(compressed)
+        os.replace(tmp_path, final_path)
+        path.unlink()
+        return str(final_path), len(compressed), hashlib.sha256(compressed).hexdigest()
+
+    return path_str, len(data), hashlib.sha256(data).hexdigest()
+
+@functools.lru_cache(maxsize=4096)
+def _host_and_path(url):
+    """Descomponer la URL en (dominio sin www, ruta aplanada), memoizado
+
+    La misma URL se parsea en varios puntos del pipeline (sanitización,
+    límites por dominio); cachear evita repetir el trabajo.
+    """
+    parsed = urlparse(url)
+    return parsed.netloc.replace('www.', ''), parsed.path.replace('/', '_').strip('_')
+
 class GitHubCapture:
     def __init__(self, base_folder="capturas"):
         self.base_folder = Path(base_folder)
+        self.browser_server = None
+        self.browser_endpoint = None
+        # Timestamp único de la corrida: carpetas y reportes consistentes
+        self.run_start = datetime.now()
+        self.run_end = None
+
+        # Argumentos de Chromium pre-serializados como arreglo JSON:
+        # SingleFile los parsea sin re-split estilo shell
+        self._browser_args = json.dumps([
+            "--no-sandbox", "--disable-dev-shm-usage", "--headless",
+            "--disable-gpu", "--disable-extensions"
+        ])
+
+        # Pool de procesos para compresión/hashing; se crea al capturar
+        self._cpu_pool = None
+
+        # Prefijo de comando inmutable, construido una sola vez por corrida
+        self._cmd_prefix = (
+            'single-file',
+            '--wait-for', '3000',  # Esperar 3 segundos
+            '--load-deferred-images', 'true',
+            '--max-resource-size', '25',  # 25MB max por recurso
+            '--compress-CSS', 'true',
+            '--compress-HTML', 'true',
+            '--remove-unused-styles', 'true',
+            '--remove-unused-fonts', 'true',
+            '--remove-alternative-medias', 'true'
+        )
         self.setup_logging()
         self.setup_folders()
-        
+        self.etag_cache = self.load_etag_cache()
+        self.start_browser_server()
+
     def setup_logging(self):
         """Configurar logging para GitHub Actions"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[logging.StreamHandler()]
+        formatter = logging.Formatter(
+            fmt='%(asctime)s - %(levelname)s - %(message)s',
+            datefmt='%H:%M:%S',
+            style='%'
         )
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+
+        # Los workers encolan registros sin esperar el lock del stream;
+        # un listener en segundo plano los emite en orden
+        self._log_queue = queue.SimpleQueue()
+        self._log_listener = logging.handlers.QueueListener(self._log_queue, stream_handler)
+        self._log_listener.start()
+
         self.logger = logging.getLogger(__name__)
-        
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(logging.handlers.QueueHandler(self._log_queue))
+
+    def stop_logging(self):
+        """Detener el listener de logging y vaciar la cola pendiente"""
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
+
+
     def setup_folders(self):
         """Crear estructura de carpetas"""
         self.base_folder.mkdir(exist_ok=True)
         (self.base_folder / "latest").mkdir(exist_ok=True)
-        
+
+        # Cache persistente de validadores HTTP entre ejecuciones
+        cache_folder = self.base_folder / ".cache"
+        cache_folder.mkdir(exist_ok=True)
+        self.cache_file = cache_folder / "etags.json"
+
+
         # Carpeta para la semana actual
-        today = datetime.now()
+        today = self.run_start
         week_start = today - timedelta(days=today.weekday())
         week_name = f"semana_{week_start.strftime('%Y-%m-%d')}"
         self.week_folder = self.base_folder / week_name
         self.week_folder.mkdir(exist_ok=True)
         
         self.logger.info(f"📁 Carpeta de la semana: {self.week_folder}")
-        
-    def load_urls_config(self):
-        """Cargar URLs desde archivo de configuración"""
+
+    def start_browser_server(self, port=8338):
+        """Lanzar un navegador persistente compartido entre todas las capturas
+
+        Evita pagar el arranque de Node + Chromium en cada URL: se levanta
+        una sola instancia y cada captura abre solo una pestaña nueva.
+        """
+        cmd = [
+            'single-file',
+            '--browser-server', str(port),
+            '--browser-executable-path', '/usr/bin/google-chrome',
+            '--browser-args', self._browser_args
+        ]
+
+        try:
+            self.browser_server = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True
+            )
+            # Dar tiempo a que Chromium arranque antes de la primera captura
+            time.sleep(3)
+
+            if self.browser_server.poll() is not None:
+                self.logger.warning("⚠️ El navegador persistente terminó inesperadamente")
+                self.logger.warning("⚠️ Se usará un navegador nuevo por cada captura")
+                self.browser_server = None
+                return
+
+            self.browser_endpoint = f"http://127.0.0.1:{port}"
+            self.logger.info(f"🌐 Navegador persistente iniciado en puerto {port}")
+
+        except FileNotFoundError:
+            # single-file no instalado; capture_single_page reportará el error
+            self.logger.warning("⚠️ No se pudo iniciar el navegador persistente")
+            self.browser_server = None
+
+    def stop_browser_server(self):
+        """Detener el navegador persistente si está activo"""
+        if self.browser_server is None:
+            return
+
+        self.browser_server.terminate()
+        try:
+            self.browser_server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            # Matar el grupo completo para no dejar Chromium huérfano
+            try:
+                os.killpg(self.browser_server.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.browser_server.wait()
+
+        self.browser_server = None
+        self.browser_endpoint = None
+        self.logger.info("🌐 Navegador persistente detenido")
+
+    def load_etag_cache(self):
+        """Cargar cache de validadores HTTP (ETag/Last-Modified) por URL"""
+        if not self.cache_file.exists():
+            return {}
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            self.logger.info(f"💾 Cache de ETags cargado: {len(cache)} URLs")
+            return cache
+        except Exception as e:
+            self.logger.warning(f"⚠️ Cache de ETags ilegible, se ignora: {e}")
+            return {}
+
+    def save_etag_cache(self):
+        """Guardar cache de validadores HTTP para la próxima ejecución"""
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self.etag_cache, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            self.logger.warning(f"⚠️ No se pudo guardar cache de ETags: {e}")
+
+    def fetch_validators(self, url):
+        """Obtener ETag/Last-Modified actuales de la URL vía petición HEAD"""
+        request = urllib.request.Request(url, method='HEAD')
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except Exception:
+            return None, None
+
+    def probe_url(self, url):
+        """Verificar con un HEAD rápido que la URL responde
+
+        Una URL muerta costaba el timeout completo de Chromium (90s);
+        el HEAD con 5s de timeout y un reintento la descarta en segundos.
+        Solo se descarta lo concluyente: errores de conexión y 404/410.
+        Devuelve None si está viva, o el motivo del fallo.
+        """
+        request = urllib.request.Request(
+            url, method='HEAD', headers={'User-Agent': _PROBE_USER_AGENT})
+        reason = None
+        for _ in range(2):
+            try:
+                with urllib.request.urlopen(request, timeout=5):
+                    return None
+            except urllib.error.HTTPError as e:
+                if e.code not in (404, 410):
+                    # El servidor respondió: la página puede existir aunque
+                    # rechace el HEAD (405) o filtre bots (403/429)
+                    return None
+                reason = f"HTTP {e.code}"
+            except Exception as e:
+                reason = str(e) or type(e).__name__
+        return reason
+
+    def check_cached_capture(self, url, filename, output_path):
+        """Reutilizar la captura previa si la página no cambió desde entonces
+
+        Si el ETag/Last-Modified reportado por el servidor coincide con el
+        de la última captura, se enlaza el HTML de la semana anterior en
+        lugar de volver a renderizar con Chromium.
+        """
+        entry = self.etag_cache.get(url)
+        if not entry or not entry.get('last_path'):
+            return None
+
+        prev_path = Path(entry['last_path'])
+        if not prev_path.exists():
+            return None
+
+        # La captura previa puede estar comprimida (.html.zst)
+        if prev_path.name.endswith('.zst'):
+            output_path = output_path.with_suffix('.html.zst')
+
+        etag, last_modified = self.fetch_validators(url)
+        unchanged = (etag is not None and etag == entry.get('etag')) or \
+                    (etag is None and last_modified is not None and
+                     last_modified == entry.get('last_modified'))
+        if not unchanged:
+            return None
+
+        # Página sin cambios: enlazar la captura previa sin invocar SingleFile
+        if prev_path != output_path:
+            if output_path.exists():
+                output_path.unlink()
+            try:
+                os.link(prev_path, output_path)
+            except OSError:
+                shutil.copyfile(prev_path, output_path)
+            entry['last_path'] = str(output_path)
+
+        file_size = output_path.stat().st_size
+        size_mb = file_size / 1024 / 1024
+        self.logger.info("Sin cambios %s - reutilizada (%.2fMB)", output_path.name, size_mb)
+
+        return {
+            "status": "success",
+            "filename": filename,
+            "url": url,
+            "size": file_size,
+            "size_mb": round(size_mb, 2),
+            "cached": True
+        }
+
+    def drop_page_cache(self, path):
+        """Sugerir al kernel descartar el archivo del page cache
+
+        Las capturas no se vuelven a leer en este proceso; liberar el
+        cache evita presión de memoria en los runners chicos de Actions.
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            with open(path, 'rb') as f:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+    def update_etag_cache(self, url, output_path, sha256_digest):
+        """Registrar los validadores de una captura recién descargada"""
+        etag, last_modified = self.fetch_validators(url)
+        self.etag_cache[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": sha256_digest,
+            "last_path": str(output_path)
+        }
+
+    def iter_urls(self):
+        """Iterar pares (nombre, url) del archivo de configuración
+
+        Para configuraciones grandes (>1 MiB) usa ijson y va entregando
+        pares conforme se parsean, sin materializar todo el dict; para el
+        caso habitual usa json estándar como siempre.
+        """
         config_file = Path("config/urls.json")
-        
+
         if not config_file.exists():
             self.logger.error(f"❌ Archivo de configuración no encontrado: {config_file}")
-            return {}
-            
+            return
+
         try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                
-            urls = config.get('urls', {})
-            self.logger.info(f"📋 URLs cargadas: {len(urls)}")
-            
-            # Mostrar primeras 3 URLs como muestra
-            for i, (name, url) in enumerate(list(urls.items())[:3]):
-                self.logger.info(f"   {i+1}. {name}: {url}")
-            
-            if len(urls) > 3:
-                self.logger.info(f"   ... y {len(urls) - 3} URLs más")
-                
-            return urls
-            
-        except json.JSONDecodeError as e:
+            if ijson is not None and config_file.stat().st_size > _STREAMING_CONFIG_SIZE:
+                with open(config_file, 'rb') as f:
+                    yield from ijson.kvitems(f, 'urls')
+            else:
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                yield from config.get('urls', {}).items()
+
+        except (json.JSONDecodeError, ValueError) as e:
             self.logger.error(f"❌ Error en formato JSON: {e}")
-            return {}
         except Exception as e:
             self.logger.error(f"❌ Error leyendo configuración: {e}")
-            return {}
             
     def sanitize_filename(self, url, custom_name=None):
         """Crear nombre de archivo válido para GitHub"""
+        # Caso común: el nombre del config ya es un identificador seguro
+        if custom_name and _SAFE_NAME.fullmatch(custom_name):
+            return custom_name
+
         if custom_name:
             # Limpiar nombre personalizado
-            filename = "".join(c for c in custom_name if c.isalnum() or c in (' ', '-', '_'))
-            filename = filename.replace(' ', '_').strip('_')
+            filename = _UNSAFE_CHARS.sub('', custom_name)
+            filename = _SPACES.sub('_', filename).strip('_')
         else:
             # Generar desde URL
-            parsed = urlparse(url)
-            domain = parsed.netloc.replace('www.', '')
-            path = parsed.path.replace('/', '_').strip('_')
+            domain, path = _host_and_path(url)
             filename = f"{domain}_{path}" if path else domain
             
         # Limpiar caracteres problemáticos
-        filename = "".join(c for c in filename if c.isalnum() or c in ('-', '_'))
+        filename = _NON_FILENAME.sub('', filename)
         
         # Limitar longitud y asegurar que no esté vacío
         filename = filename[:80] if filename else "sitio_sin_nombre"
         
         return filename
         
-    def capture_single_page(self, url, filename):
+    async def capture_single_page(self, url, filename):
         """Capturar una sola página usando SingleFile CLI en GitHub Actions"""
         try:
             output_path = self.week_folder / f"{filename}.html"
-            
+
+            # Si la página no cambió, reutilizar la captura anterior
+            cached = await asyncio.to_thread(self.check_cached_capture, url, filename, output_path)
+            if cached:
+                return cached
+
+            # Descartar rápido URLs muertas antes de gastar un Chromium
+            dead_reason = await asyncio.to_thread(self.probe_url, url)
+            if dead_reason:
+                self.logger.error("URL inaccesible %s: %s", filename, dead_reason)
+                return {
+                    "status": "error",
+                    "filename": filename,
+                    "url": url,
+                    "error": f"HEAD falló: {dead_reason}"
+                }
+
+            # Eliminar cualquier captura previa antes de renderizar: puede
+            # ser un enlace duro a la semana anterior (cache de ETag) y
+            # SingleFile escribiría a través del inodo compartido, pisando
+            # el archivo archivado de esa semana
+            for stale in (output_path, output_path.with_suffix('.html.zst')):
+                try:
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+
             # Comando optimizado para GitHub Actions (Ubuntu)
-            cmd = [
-                'single-file',
-                url,
-                str(output_path),
-                '--browser-executable-path', '/usr/bin/google-chrome',
-                '--browser-args', '--no-sandbox --disable-dev-shm-usage --headless --disable-gpu --disable-extensions',
-                '--wait-for', '3000',  # Esperar 3 segundos
-                '--load-deferred-images', 'true',
-                '--max-resource-size', '25',  # 25MB max por recurso
-                '--compress-CSS', 'true',
-                '--compress-HTML', 'true',
-                '--remove-unused-styles', 'true',
-                '--remove-unused-fonts', 'true',
-                '--remove-alternative-medias', 'true'
-            ]
-            
-            self.logger.info(f"📥 Capturando: {url}")
+            if self.browser_endpoint:
+                # Reutilizar el navegador persistente (solo abre una pestaña)
+                cmd = (*self._cmd_prefix,
+                       '--browser-server-endpoint', self.browser_endpoint,
+                       url, str(output_path))
+            else:
+                # Sin servidor disponible: lanzar un navegador propio
+                cmd = (*self._cmd_prefix,
+                       '--browser-executable-path', '/usr/bin/google-chrome',
+                       '--browser-args', self._browser_args,
+                       url, str(output_path))
             
+            self.logger.info("Capturando: %s", url)
+
             # Ejecutar comando con timeout
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                timeout=90,  # 90 segundos timeout
-                cwd=os.getcwd()
+            # start_new_session aísla el grupo de procesos: en un timeout
+            # se mata también al Chromium hijo, no solo al proceso Node
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
             )
-            
-            if result.returncode == 0:
-                # Verificar que el archivo se creó correctamente
-                if output_path.exists():
-                    file_size = output_path.stat().st_size
-                    
-                    if file_size > 2000:  # Al menos 2KB
-                        size_mb = file_size / 1024 / 1024
-                        self.logger.info(f"✅ {filename}.html - {size_mb:.2f}MB")
-                        return {
-                            "status": "success",
-                            "filename": filename,
-                            "url": url,
-                            "size": file_size,
-                            "size_mb": round(size_mb, 2)
-                        }
-                    else:
-                        self.logger.warning(f"⚠️ Archivo muy pequeño: {filename} ({file_size} bytes)")
-                        return {
-                            "status": "error",
-                            "filename": filename,
-                            "url": url,
-                            "error": f"Archivo muy pequeño ({file_size} bytes)"
-                        }
-                else:
-                    self.logger.error(f"❌ Archivo no creado: {filename}")
+
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    proc.communicate(),
+                    timeout=90  # 90 segundos timeout
+                )
+            except asyncio.TimeoutError:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+                raise
+
+            if proc.returncode == 0:
+                # Verificar con un solo stat que el archivo se creó correctamente
+                try:
+                    file_size = os.stat(output_path).st_size
+                except FileNotFoundError:
+                    self.logger.error("Archivo no creado: %s", filename)
                     return {
                         "status": "error",
                         "filename": filename,
                         "url": url,
                         "error": "Archivo no fue creado"
                     }
+
+                if file_size > 2000:  # Al menos 2KB
+                    # Compresión + hashing en el pool de procesos para que
+                    # el trabajo de CPU no serialice detrás del GIL
+                    loop = asyncio.get_running_loop()
+                    final_str, disk_size, digest = await loop.run_in_executor(
+                        self._cpu_pool, _post_process_capture, str(output_path))
+                    final_path = Path(final_str)
+                    size_mb = disk_size / 1024 / 1024
+                    self.logger.info("OK %s - %.2fMB", final_path.name, size_mb)
+                    await asyncio.to_thread(self.update_etag_cache, url, final_path, digest)
+                    self.drop_page_cache(final_path)
+                    return {
+                        "status": "success",
+                        "filename": filename,
+                        "url": url,
+                        "size": disk_size,
+                        "size_mb": round(size_mb, 2)
+                    }
+                else:
+                    self.logger.warning("Archivo muy pequeño: %s (%d bytes)", filename, file_size)
+                    return {
+                        "status": "error",
+                        "filename": filename,
+                        "url": url,
+                        "error": f"Archivo muy pequeño ({file_size} bytes)"
+                    }
             else:
                 # Error en SingleFile
-                error_msg = result.stderr.strip() or result.stdout.strip() or "Error desconocido"
-                self.logger.error(f"❌ Error en {filename}: {error_msg}")
+                error_msg = stderr.decode().strip() or stdout.decode().strip() or "Error desconocido"
+                self.logger.error("Error en %s: %s", filename, error_msg)
                 return {
                     "status": "error",
                     "filename": filename,
@@ -172,8 +542,8 @@ class GitHubCapture:
                     "error": error_msg[:200]  # Limitar longitud del error
                 }
                 
-        except subprocess.TimeoutExpired:
-            self.logger.error(f"❌ Timeout en {filename} (90s)")
+        except asyncio.TimeoutError:
+            self.logger.error("Timeout en %s (90s)", filename)
             return {
                 "status": "error",
                 "filename": filename,
@@ -181,7 +551,7 @@ class GitHubCapture:
                 "error": "Timeout (90 segundos)"
             }
         except Exception as e:
-            self.logger.error(f"❌ Excepción en {filename}: {str(e)}")
+            self.logger.error("Excepción en %s: %s", filename, e)
             return {
                 "status": "error",
                 "filename": filename,
@@ -189,63 +559,95 @@ class GitHubCapture:
                 "error": str(e)[:200]
             }
             
-    def capture_all_urls(self, max_workers=2):
+    async def capture_all_urls(self, max_workers=2):
         """Capturar todas las URLs configuradas"""
-        urls_dict = self.load_urls_config()
-        
-        if not urls_dict:
-            self.logger.error("❌ No hay URLs para capturar")
-            self.logger.info("💡 Verifica config/urls.json")
-            return {"error": "No URLs configuradas"}
-            
-        self.logger.info(f"🚀 Iniciando captura de {len(urls_dict)} URLs")
-        self.logger.info(f"⚙️ Workers simultáneos: {max_workers}")
-        
-        results = []
+        self.logger.info(f"⚙️ Capturas simultáneas: {max_workers}")
+
         start_time = time.time()
-        
-        # Preparar trabajos
+
+        # Pool de procesos para la etapa de CPU (zstd + sha256), solapada
+        # con la espera de los subprocesos de captura
+        self._cpu_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+        # Ejecutar capturas en paralelo, limitadas por un semáforo global
+        # más un semáforo y una pausa mínima por dominio
+        semaphore = asyncio.Semaphore(max_workers)
+        domain_semaphores = defaultdict(lambda: asyncio.Semaphore(_DOMAIN_MAX_CONCURRENT))
+        domain_last_start = defaultdict(float)
+
+        async def bounded_capture(url, filename):
+            host, _ = _host_and_path(url)
+            async with semaphore, domain_semaphores[host]:
+                wait = _DOMAIN_MIN_DELAY - (time.monotonic() - domain_last_start[host])
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                domain_last_start[host] = time.monotonic()
+                return await self.capture_single_page(url, filename)
+
+        # Lanzar tareas conforme se parsea la configuración: las primeras
+        # capturas arrancan sin esperar a leer todo el archivo
         jobs = []
-        for name, url in urls_dict.items():
+        tasks = []
+        for name, url in self.iter_urls():
             filename = self.sanitize_filename(url, name)
+            if len(jobs) < 3 and self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("   %d. %s: %s", len(jobs) + 1, name, url)
             jobs.append((url, filename))
-            
-        # Ejecutar capturas en paralelo
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Enviar todos los trabajos
-            future_to_job = {
-                executor.submit(self.capture_single_page, url, filename): (url, filename)
-                for url, filename in jobs
-            }
-            
-            # Procesar resultados conforme van completándose
-            for future in concurrent.futures.as_completed(future_to_job):
-                url, filename = future_to_job[future]
-                try:
-                    result = future.result()
-                    results.append(result)
-                except Exception as e:
-                    self.logger.error(f"❌ Error en worker para {filename}: {e}")
-                    results.append({
-                        "status": "error",
-                        "filename": filename,
-                        "url": url,
-                        "error": f"Worker error: {str(e)}"
-                    })
-        
+            tasks.append(asyncio.create_task(bounded_capture(url, filename)))
+
+        if not jobs:
+            self._cpu_pool.shutdown()
+            self._cpu_pool = None
+            self.logger.error("❌ No hay URLs para capturar")
+            self.logger.info("💡 Verifica config/urls.json")
+            return {"error": "No URLs configuradas"}
+
+        self.logger.info(f"🚀 Iniciando captura de {len(jobs)} URLs")
+
+        try:
+            raw_results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._cpu_pool.shutdown()
+            self._cpu_pool = None
+
+        results = []
+        for (url, filename), result in zip(jobs, raw_results):
+            if isinstance(result, BaseException):
+                self.logger.error("Error en worker para %s: %s", filename, result)
+                results.append({
+                    "status": "error",
+                    "filename": filename,
+                    "url": url,
+                    "error": f"Worker error: {str(result)}"
+                })
+            else:
+                results.append(result)
+
         elapsed_time = time.time() - start_time
-        
-        # Generar estadísticas
-        successful = [r for r in results if r['status'] == 'success']
-        failed = [r for r in results if r['status'] == 'error']
-        
+        self.run_end = datetime.now()
+
+        # Persistir validadores para la próxima semana
+        self.save_etag_cache()
+
+        # Generar estadísticas en una sola pasada sobre los resultados
+        successful, failed = [], []
+        total_size = cached_count = 0
+        for r in results:
+            if r['status'] == 'success':
+                successful.append(r)
+                total_size += r.get('size', 0)
+                if r.get('cached'):
+                    cached_count += 1
+            else:
+                failed.append(r)
+
         self.logger.info(f"⏱️ Tiempo total: {elapsed_time:.1f} segundos")
-        self.logger.info(f"✅ Exitosas: {len(successful)}")
+        self.logger.info(f"✅ Exitosas: {len(successful)} ({cached_count} sin cambios)")
         self.logger.info(f"❌ Fallidas: {len(failed)}")
-        
+
         # Generar reportes
-        self.generate_reports(results, elapsed_time)
-        
+        self.generate_reports(successful, failed, total_size, elapsed_time)
+
         return {
             "total": len(results),
             "successful": len(successful),
@@ -254,18 +656,14 @@ class GitHubCapture:
             "folder": str(self.week_folder)
         }
         
-    def generate_reports(self, results, elapsed_time):
+    def generate_reports(self, successful, failed, total_size, elapsed_time):
         """Generar reportes detallados"""
-        successful = [r for r in results if r['status'] == 'success']
-        failed = [r for r in results if r['status'] == 'error']
-        total_size = sum(r.get('size', 0) for r in successful)
-        
         # Reporte JSON completo
         report = {
-            "fecha_ejecucion": datetime.now().isoformat(),
+            "fecha_ejecucion": self.run_end.isoformat(),
             "fecha_semana": str(self.week_folder.name),
             "estadisticas": {
-                "total_urls": len(results),
+                "total_urls": len(successful) + len(failed),
                 "exitosas": len(successful),
                 "fallidas": len(failed),
                 "tiempo_total_segundos": round(elapsed_time, 2),
@@ -278,7 +676,8 @@ class GitHubCapture:
                     "filename": r['filename'],
                     "url": r['url'],
                     "size_bytes": r.get('size', 0),
-                    "size_mb": r.get('size_mb', 0)
+                    "size_mb": r.get('size_mb', 0),
+                    "cached": r.get('cached', False)
                 }
                 for r in successful
             ],
@@ -292,30 +691,73 @@ class GitHubCapture:
             ]
         }
         
-        # Guardar reporte JSON en ambas ubicaciones
-        for folder in [self.week_folder, self.base_folder / "latest"]:
-            report_file = folder / "report.json"
-            with open(report_file, 'w', encoding='utf-8') as f:
-                json.dump(report, f, indent=2, ensure_ascii=False)
-            self.logger.info(f"📄 Reporte JSON: {report_file}")
-                
+        # Serializar una sola vez y enlazar en latest/ en vez de escribir dos veces
+        if orjson is not None:
+            payload = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(report, indent=2, ensure_ascii=False).encode('utf-8')
+
+        report_file = self.week_folder / "report.json"
+        self.atomic_write(report_file, payload)
+        self.link_into_latest(report_file)
+        self.drop_page_cache(report_file)
+        self.logger.info(f"📄 Reporte JSON: {report_file}")
+
         # Generar resumen en Markdown
         summary_md = self.generate_summary_markdown(report)
-        
-        # Guardar resumen en ambas ubicaciones
-        for folder in [self.week_folder, self.base_folder / "latest"]:
-            summary_file = folder / "summary.md"
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                f.write(summary_md)
-            self.logger.info(f"📄 Resumen MD: {summary_file}")
-                
+
+        summary_file = self.week_folder / "summary.md"
+        self.atomic_write(summary_file, summary_md.encode('utf-8'))
+        self.link_into_latest(summary_file)
+        self.drop_page_cache(summary_file)
+        self.logger.info(f"📄 Resumen MD: {summary_file}")
+
+        # Asegurar los renames con un fsync por directorio
+        self.sync_folder(self.week_folder)
+        self.sync_folder(self.base_folder / "latest")
+
         self.logger.info(f"📊 Reportes generados exitosamente")
-        
+
+    def atomic_write(self, path, data):
+        """Escribir bytes de forma atómica: tmp + fdatasync + os.replace
+
+        Si la corrida muere a mitad de escritura, los lectores (p.ej.
+        local_test o el workflow) nunca ven un reporte truncado.
+        """
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            getattr(os, 'fdatasync', os.fsync)(f.fileno())
+        os.replace(tmp, path)
+
+    def sync_folder(self, folder):
+        """Un único fsync del directorio para asegurar los renames"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(folder, os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def link_into_latest(self, source):
+        """Enlazar un archivo de la semana dentro de capturas/latest/"""
+        target = self.base_folder / "latest" / source.name
+        if target.exists():
+            target.unlink()
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
     def generate_summary_markdown(self, report):
         """Generar resumen en formato Markdown"""
         stats = report['estadisticas']
         
-        summary = f"""# 📸 Captura Semanal - {datetime.now().strftime('%d/%m/%Y %H:%M')}
+        # Acumular en una lista y unir al final: evita la concatenación
+        # O(n²) de str += dentro de los bucles por URL
+        parts = [f"""# 📸 Captura Semanal - {self.run_end.strftime('%d/%m/%Y %H:%M')}
 
 ## 📊 Estadísticas Generales
 
@@ -331,49 +773,63 @@ class GitHubCapture:
 
 ## ✅ Capturas Exitosas
 
-"""
-        
+"""]
+
+        exitosa_row = "- **{filename}** - {size_mb}MB{cached}  \n  `{url}`\n\n"
         for capture in report['capturas_exitosas']:
-            summary += f"- **{capture['filename']}** - {capture['size_mb']}MB  \n"
-            summary += f"  `{capture['url']}`\n\n"
-            
+            cached_mark = " ♻️ _(sin cambios)_" if capture.get('cached') else ""
+            parts.append(exitosa_row.format(
+                filename=capture['filename'],
+                size_mb=capture['size_mb'],
+                cached=cached_mark,
+                url=capture['url']
+            ))
+
         if report['capturas_fallidas']:
-            summary += "## ❌ Capturas Fallidas\n\n"
+            parts.append("## ❌ Capturas Fallidas\n\n")
+            fallida_row = "- **{filename}** - {error}  \n  `{url}`\n\n"
             for failure in report['capturas_fallidas']:
-                summary += f"- **{failure['filename']}** - {failure['error']}  \n"
-                summary += f"  `{failure['url']}`\n\n"
-                
-        summary += f"""
+                parts.append(fallida_row.format(
+                    filename=failure['filename'],
+                    error=failure['error'],
+                    url=failure['url']
+                ))
+
+        parts.append(f"""
 ---
-📅 **Generado**: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} UTC  
+📅 **Generado**: {self.run_end.strftime('%d/%m/%Y %H:%M:%S')} UTC  
 🤖 **Sistema**: GitHub Actions + SingleFile CLI  
 📁 **Carpeta**: `{report['fecha_semana']}`
-"""
-        
-        return summary
+""")
+
+        return "".join(parts)
 
 def main():
     """Función principal"""
+    # El cuello de botella es red + Chromium, no Python: escalar con los cores
+    default_workers = max(1, min((os.cpu_count() or 2) * 2, 32))
+
     parser = argparse.ArgumentParser(description='Captura semanal automatizada para GitHub Actions')
-    parser.add_argument('--max-workers', type=int, default=2, 
-                       help='Número de capturas simultáneas (1-3)')
+    parser.add_argument('--max-workers', type=int, default=default_workers,
+                       help=f'Número de capturas simultáneas (default: {default_workers})')
     args = parser.parse_args()
-    
+
     # Validar argumentos
-    if args.max_workers < 1 or args.max_workers > 3:
-        print("❌ max-workers debe estar entre 1 y 3")
+    if args.max_workers < 1:
+        print("❌ max-workers debe ser al menos 1")
         exit(1)
-    
+
     print("🚀 CAPTURA SEMANAL - GITHUB ACTIONS")
     print("=" * 40)
     
+    capturer = None
     try:
         # Crear instancia del capturador
         capturer = GitHubCapture()
-        
+
         # Ejecutar capturas
-        result = capturer.capture_all_urls(max_workers=args.max_workers)
-        
+        result = asyncio.run(capturer.capture_all_urls(max_workers=args.max_workers))
+
         if "error" in result:
             print(f"❌ Error: {result['error']}")
             exit(1)
@@ -389,6 +845,10 @@ def main():
     except Exception as e:
         print(f"\n❌ Error inesperado: {e}")
         exit(1)
+    finally:
+        if capturer is not None:
+            capturer.stop_browser_server()
+            capturer.stop_logging()
 
 if __name__ == "__main__":
     main()
@@ -156,6 +156,23 @@ def run_test_capture():
         print(f"❌ Error ejecutando prueba: {e}")
         return False
 
+def walk_html_sizes(root):
+    """Contar archivos .html y sumar sus tamaños en una sola pasada
+
+    Usa os.scandir para aprovechar el stat cacheado en cada entrada,
+    en vez de un glob recursivo más una segunda pasada de stat.
+    """
+    count, total = 0, 0
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False):
+            sub_count, sub_total = walk_html_sizes(entry.path)
+            count += sub_count
+            total += sub_total
+        elif entry.name.endswith(('.html', '.html.zst')):
+            count += 1
+            total += entry.stat().st_size
+    return count, total
+
 def show_results():
     """Mostrar resultados de la prueba"""
     print("📊 Verificando resultados de la prueba...")
@@ -201,10 +218,9 @@ def show_results():
     # Verificar archivos HTML generados
     capturas_folder = Path("capturas")
     if capturas_folder.exists():
-        html_files = list(capturas_folder.glob("**/*.html"))
-        if html_files:
-            print(f"\n📁 Total archivos HTML generados: {len(html_files)}")
-            total_size = sum(f.stat().st_size for f in html_files)
+        html_count, total_size = walk_html_sizes(capturas_folder)
+        if html_count:
+            print(f"\n📁 Total archivos HTML generados: {html_count}")
             print(f"💾 Tamaño total: {total_size / 1024 / 1024:.1f}MB")
         else:
             print("⚠️ No se generaron archivos HTML")
@@ -5,133 +5,231 @@ Actualizador automático de README.md con estadísticas de última captura
 Se ejecuta automáticamente después de cada captura en GitHub Actions
 """
 
+import functools
 import json
-import re
+import mmap
+import os
+import string
+import sys
 from pathlib import Path
-from datetime import datetime
+
+# orjson parsea varias veces más rápido que json; opcional con fallback a stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rutas y centinelas fijos, construidos una sola vez al importar
+REPORT_FILE = Path("capturas/latest/report.json")
+README_FILE = Path("README.md")
+START_MARKER = '<!-- REPORTE_INICIO -->'
+END_MARKER = '<!-- REPORTE_FIN -->'
+
+# Plantilla del bloque de reporte, parseada una sola vez al importar;
+# re-renderizar N reportes (p.ej. históricos) no re-parsea el formato
+_REPORT_TEMPLATE = string.Template(
+    "\n**📅 Última ejecución:** ${now} UTC\n\n"
+    + "\n".join([
+        "| Métrica | Valor |",
+        "|---------|-------|",
+        "| 🎯 **Total URLs** | ${total} |",
+        "| ✅ **Exitosas** | ${ok} |",
+        "| ❌ **Fallidas** | ${fail} |",
+        "| 📈 **Tasa de éxito** | ${rate}% |",
+        "| ⏱️ **Tiempo total** | ${secs}s |",
+        "| 💾 **Tamaño total** | ${mb} MB |",
+        "| 📊 **Promedio por página** | ${avg} MB |",
+    ])
+    + "\n\n🔗 **[Ver reporte completo](capturas/latest/summary.md)**"
+      " | 📦 **[Descargar capturas](../../actions)**\n"
+)
+
+@functools.lru_cache(maxsize=4)
+def _load_report_cached(path_str, mtime_ns):
+    """Parsear el reporte; la clave por mtime invalida sola la entrada"""
+    data = Path(path_str).read_bytes()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _load_report():
+    """Leer y parsear el reporte, memoizado mientras no cambie en disco
+
+    Si este módulo se importa como librería (p.ej. un generador de
+    dashboard), las llamadas repetidas no re-leen ni re-parsean el JSON.
+    """
+    return _load_report_cached(str(REPORT_FILE), REPORT_FILE.stat().st_mtime_ns)
+
+def publish_step_summary(reporte_content, stats):
+    """Publicar las estadísticas donde los pasos posteriores las consumen
+
+    El bloque va al resumen del job de Actions y stats.json deja los
+    números en JSON para que los pasos siguientes usen jq en vez de
+    re-parsear el README con regex de shell.
+    """
+    summary_path = os.environ.get('GITHUB_STEP_SUMMARY')
+    if summary_path:
+        try:
+            with open(summary_path, 'a', encoding='utf-8') as f:
+                f.write(reporte_content)
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir el step summary: {e}")
+
+    try:
+        (REPORT_FILE.parent / "stats.json").write_text(
+            json.dumps(stats, ensure_ascii=False), encoding='utf-8')
+    except OSError as e:
+        print(f"⚠️ No se pudo escribir stats.json: {e}")
 
 def update_readme_with_report():
     """Actualiza README.md con el último reporte de captura"""
     
     print("📝 Actualizando README.md con último reporte...")
-    
-    # Leer reporte de última captura
-    report_file = Path("capturas/latest/report.json")
-    if not report_file.exists():
-        print("⚠️ No hay reporte disponible para actualizar README")
-        print(f"   Archivo esperado: {report_file}")
-        return False
-        
+
+    # Si el README ya es más nuevo que el reporte, no hay corrida nueva que
+    # reflejar (un `touch capturas/latest/report.json` fuerza la actualización)
+    try:
+        if REPORT_FILE.stat().st_mtime_ns <= README_FILE.stat().st_mtime_ns:
+            print("ℹ️ Reporte no más nuevo que README; nada que hacer")
+            return True
+    except FileNotFoundError:
+        pass  # los mensajes específicos salen en las lecturas de abajo
+
+    # Leer reporte de última captura (EAFP: abrir directo, sin chequeo previo)
     try:
-        with open(report_file, 'r', encoding='utf-8') as f:
-            report = json.load(f)
+        report = _load_report()
+    except FileNotFoundError:
+        sys.stdout.write(
+            "⚠️ No hay reporte disponible para actualizar README\n"
+            f"   Archivo esperado: {REPORT_FILE}\n")
+        return False
     except Exception as e:
         print(f"❌ Error leyendo reporte: {e}")
         return False
     
     stats = report.get('estadisticas', {})
+
+    # Una sola búsqueda por clave: se reutilizan en el bloque y los prints
+    total = stats.get('total_urls', 0)
+    ok = stats.get('exitosas', 0)
+    fail = stats.get('fallidas', 0)
+    secs = stats.get('tiempo_total_segundos', 0)
+    mb = stats.get('tamaño_total_mb', 0)
+    avg = stats.get('promedio_mb_por_pagina', 0)
+    rate = ok / max(total, 1) * 100
+    # Import diferido: las salidas tempranas (mtime, reporte ausente) no
+    # pagan el costo de cargar datetime en el arranque del proceso
+    from datetime import datetime
+
+    # utcnow: la etiqueta del bloque siempre dijo UTC pero se usaba hora local
+    now = datetime.utcnow().strftime('%d/%m/%Y %H:%M')
+
+    # Crear contenido del reporte para README desde la plantilla precompilada
+    reporte_content = _REPORT_TEMPLATE.substitute(
+        now=now, total=total, ok=ok, fail=fail,
+        rate=f"{rate:.1f}", secs=secs, mb=mb, avg=avg)
     
-    # Crear contenido del reporte para README
-    reporte_content = f"""
-**📅 Última ejecución:** {datetime.now().strftime('%d/%m/%Y %H:%M')} UTC
-
-| Métrica | Valor |
-|---------|-------|
-| 🎯 **Total URLs** | {stats.get('total_urls', 0)} |
-| ✅ **Exitosas** | {stats.get('exitosas', 0)} |
-| ❌ **Fallidas** | {stats.get('fallidas', 0)} |
-| 📈 **Tasa de éxito** | {(stats.get('exitosas', 0)/max(stats.get('total_urls', 1), 1)*100):.1f}% |
-| ⏱️ **Tiempo total** | {stats.get('tiempo_total_segundos', 0)}s |
-| 💾 **Tamaño total** | {stats.get('tamaño_total_mb', 0)} MB |
-| 📊 **Promedio por página** | {stats.get('promedio_mb_por_pagina', 0)} MB |
-
-🔗 **[Ver reporte completo](capturas/latest/summary.md)** | 📦 **[Descargar capturas](../../actions)**
-"""
-    
+    # Empalme O(1) sobre el archivo mapeado: si el bloque nuevo mide lo
+    # mismo que el existente (caso común entre corridas, los números solo
+    # cambian de valor), se sobreescribe en el lugar sin leer ni
+    # reescribir el README completo
+    reporte_bytes = reporte_content.encode('utf-8')
+    start_bytes = START_MARKER.encode('utf-8')
+    end_bytes = END_MARKER.encode('utf-8')
+    try:
+        with open(README_FILE, 'r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+            i = mm.find(start_bytes)
+            j = mm.find(end_bytes, i + len(start_bytes)) if i != -1 else -1
+            if (i != -1 and j != -1
+                    and j - i - len(start_bytes) == len(reporte_bytes)):
+                if mm[i + len(start_bytes):j] == reporte_bytes:
+                    print("ℹ️ README sin cambios; se omite escritura")
+                    return True
+                mm[i + len(start_bytes):j] = reporte_bytes
+                mm.flush()
+                publish_step_summary(reporte_content, stats)
+                # Un solo write evita un syscall por línea bajo logs sin buffer
+                sys.stdout.write(
+                    "✅ README.md actualizado con último reporte\n"
+                    f"   Exitosas: {ok}/{total}\n"
+                    f"   Tiempo: {secs}s\n"
+                    f"   Tamaño: {mb}MB\n")
+                sys.stdout.flush()
+                return True
+    except (OSError, ValueError):
+        # README ausente, vacío o no mapeable: sigue el camino de texto,
+        # que ya tiene los diagnósticos específicos
+        pass
+
     # Leer README actual
-    readme_file = Path("README.md")
-    if not readme_file.exists():
-        print("❌ README.md no encontrado")
-        print("💡 Asegúrate de que el archivo README.md existe en la raíz del repositorio")
-        return False
-        
     try:
-        with open(readme_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
+        content = README_FILE.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        sys.stdout.write(
+            "❌ README.md no encontrado\n"
+            "💡 Asegúrate de que el archivo README.md existe en la raíz del repositorio\n")
+        return False
+    except (OSError, UnicodeDecodeError) as e:
         print(f"❌ Error leyendo README: {e}")
         return False
-    
-    # Buscar y reemplazar la sección del reporte
-    # Los marcadores deben estar en el README para que funcione
-    pattern = r'<!-- REPORTE_INICIO -->.*?<!-- REPORTE_FIN -->'
-    replacement = f'<!-- REPORTE_INICIO -->{reporte_content}<!-- REPORTE_FIN -->'
-    
-    if '<!-- REPORTE_INICIO -->' in content and '<!-- REPORTE_FIN -->' in content:
-        # Reemplazar contenido entre marcadores
-        new_content = re.sub(pattern, replacement, content, flags=re.DOTALL)
-        
+
+    # Buscar y reemplazar la sección del reporte con búsqueda literal:
+    # los marcadores son centinelas fijos, no hace falta regex.
+    # El README tiene exactamente un bloque de reporte; se toma la primera
+    # aparición de cada marcador y el costo queda acotado a dos escaneos
+    # lineales, sin riesgo de reinicios cuadráticos si el archivo crece.
+    # Si falta el marcador de inicio, el de fin se busca desde el
+    # principio igual, para que el diagnóstico reporte cada uno por separado
+    i = content.find(START_MARKER)
+    j = (content.find(END_MARKER, i + len(START_MARKER)) if i != -1
+         else content.find(END_MARKER))
+
+    if i != -1 and j != -1:
+        # Si el bloque renderizado es idéntico al existente no hay nada
+        # que escribir, y el workflow se ahorra el commit + push posterior
+        existing = content[i + len(START_MARKER):j]
+        if existing == reporte_content:
+            print("ℹ️ README sin cambios; se omite escritura")
+            return True
+
+        new_content = (content[:i] + START_MARKER +
+                       reporte_content + content[j:])
+
         try:
-            with open(readme_file, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            print("✅ README.md actualizado con último reporte")
-            print(f"   Exitosas: {stats.get('exitosas', 0)}/{stats.get('total_urls', 0)}")
-            print(f"   Tiempo: {stats.get('tiempo_total_segundos', 0)}s")
-            print(f"   Tamaño: {stats.get('tamaño_total_mb', 0)}MB")
+            # Escritura atómica: si el runner se cancela a mitad de camino,
+            # nadie ve un README truncado
+            tmp = README_FILE.with_suffix('.md.tmp')
+            tmp.write_text(new_content, encoding='utf-8')
+            os.replace(tmp, README_FILE)
+            publish_step_summary(reporte_content, stats)
+            # Un solo write evita un syscall por línea bajo logs sin buffer
+            sys.stdout.write(
+                "✅ README.md actualizado con último reporte\n"
+                f"   Exitosas: {ok}/{total}\n"
+                f"   Tiempo: {secs}s\n"
+                f"   Tamaño: {mb}MB\n")
+            sys.stdout.flush()
             return True
         except Exception as e:
             print(f"❌ Error escribiendo README: {e}")
             return False
     else:
-        print("⚠️ README.md no tiene marcadores de reporte")
-        print("💡 Asegúrate de que README.md contiene:")
-        print("   <!-- REPORTE_INICIO -->")
-        print("   <!-- REPORTE_FIN -->")
-        return False
-
-def validate_readme_structure():
-    """Validar que README.md tiene la estructura correcta"""
-    readme_file = Path("README.md")
-    
-    if not readme_file.exists():
-        print("❌ README.md no existe")
-        return False
-    
-    try:
-        with open(readme_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        print(f"❌ Error leyendo README: {e}")
-        return False
-    
-    has_start_marker = '<!-- REPORTE_INICIO -->' in content
-    has_end_marker = '<!-- REPORTE_FIN -->' in content
-    
-    print(f"📋 Validación README.md:")
-    print(f"   Marcador inicio: {'✅' if has_start_marker else '❌'}")
-    print(f"   Marcador fin: {'✅' if has_end_marker else '❌'}")
-    
-    if has_start_marker and has_end_marker:
-        print("✅ README.md tiene estructura correcta")
-        return True
-    else:
-        print("❌ README.md necesita marcadores de reporte")
+        # Diagnóstico de marcadores con la misma lectura del README
+        sys.stdout.write(
+            "⚠️ README.md no tiene marcadores de reporte\n"
+            f"   Marcador inicio: {'✅' if i != -1 else '❌'}\n"
+            f"   Marcador fin: {'✅' if j != -1 else '❌'}\n"
+            "💡 Agrega estos marcadores a tu README.md:\n"
+            "   <!-- REPORTE_INICIO -->\n"
+            "   *El reporte se actualizará automáticamente*\n"
+            "   <!-- REPORTE_FIN -->\n")
         return False
 
 def main():
     """Función principal"""
     print("📝 ACTUALIZADOR DE README")
     print("=" * 30)
-    
-    # Validar estructura
-    if not validate_readme_structure():
-        print("💡 Agrega estos marcadores a tu README.md:")
-        print("   <!-- REPORTE_INICIO -->")
-        print("   *El reporte se actualizará automáticamente*")
-        print("   <!-- REPORTE_FIN -->")
-        return
-    
-    # Actualizar README
+
+    # Actualizar README (la validación de marcadores ocurre adentro,
+    # con una sola lectura del archivo)
     if update_readme_with_report():
         print("🎉 README.md actualizado exitosamente")
     else: